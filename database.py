@@ -5,16 +5,22 @@ Database Helper Functions with Mock Fallback
 - Automatically falls back to an in-memory mock database when not configured
 - You can force the mock by setting USE_MOCK_DB=true
 
-Import and use create_document/get_documents just the same in your API code.
+Import and use create_document(s)/get_documents just the same in your API code.
 """
 
+from array import array
 from datetime import datetime, timezone
+from itertools import islice
 import os
-from typing import Union, Dict, Any, List, Optional
+import sys
+import threading
+from typing import Union, Dict, Any, Iterable, List, Optional
 from pydantic import BaseModel
 from dotenv import load_dotenv
 from uuid import uuid4
 
+from schemas import DUMPERS
+
 # Load environment variables from .env file
 load_dotenv()
 
@@ -23,17 +29,69 @@ class InsertOneResult:
     def __init__(self, inserted_id: str):
         self.inserted_id = inserted_id
 
+class InsertManyResult:
+    def __init__(self, inserted_ids: List[str]):
+        self.inserted_ids = inserted_ids
+
 class MockCollection:
+    # Fields with an equality index so find() on them skips the full scan
+    INDEXED_FIELDS = ("user_id", "symbol")
+
     def __init__(self):
         self._docs: List[Dict[str, Any]] = []
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        # field -> value -> ids (dict used as an insertion-ordered set)
+        self._indexes: Dict[str, Dict[Any, Dict[str, None]]] = {f: {} for f in self.INDEXED_FIELDS}
+        # Serializes writers (inserts come from FastAPI's threadpool); a row may span
+        # several structures, so its storage and index updates must not interleave
+        self._lock = threading.Lock()
 
     def insert_one(self, doc: Dict[str, Any]) -> InsertOneResult:
         # Assign an _id if not present
         if "_id" not in doc:
-            doc["_id"] = str(uuid4())
-        self._docs.append(doc)
+            doc["_id"] = uuid4().hex
+        with self._lock:
+            self._append(doc)
+            for field, index in self._indexes.items():
+                try:
+                    index.setdefault(doc.get(field), {})[doc["_id"]] = None
+                except TypeError:
+                    pass  # unhashable value; such docs can't equal a hashable filter value anyway
         return InsertOneResult(doc["_id"])
 
+    def insert_many(self, docs: Iterable[Dict[str, Any]], ordered: bool = True) -> InsertManyResult:
+        return InsertManyResult([self.insert_one(doc).inserted_id for doc in docs])
+
+    # Storage hooks (overridden by column-oriented subclasses)
+    def _append(self, doc: Dict[str, Any]) -> None:
+        self._docs.append(doc)
+        self._by_id[doc["_id"]] = doc
+
+    def _get(self, _id: Any) -> Optional[Dict[str, Any]]:
+        return self._by_id.get(_id)
+
+    def _all(self) -> Iterable[Dict[str, Any]]:
+        return self._docs
+
+    def _candidates(self, filter_dict: Dict[str, Any]) -> Iterable[Dict[str, Any]]:
+        """Docs that may match (lazily): the _id hit, intersection of index buckets, or every doc."""
+        if "_id" in filter_dict:
+            try:
+                doc = self._get(filter_dict["_id"])
+            except TypeError:
+                doc = None  # unhashable _id filter can't match a stored id
+            return (doc,) if doc is not None else ()
+        try:
+            buckets = [self._indexes[k].get(v, {}) for k, v in filter_dict.items() if k in self._indexes]
+        except TypeError:
+            buckets = []  # unhashable filter value, fall back to a scan
+        if not buckets:
+            return self._all()
+        smallest = min(buckets, key=len)
+        others = [b for b in buckets if b is not smallest]
+        # Snapshot the ids: a concurrent insert must not resize the dict mid-iteration
+        return (self._get(i) for i in tuple(smallest) if all(i in b for b in others))
+
     def find(self, filter_dict: Optional[Dict[str, Any]] = None):
         filter_dict = filter_dict or {}
         def match(d: Dict[str, Any]) -> bool:
@@ -41,30 +99,109 @@ class MockCollection:
                 if d.get(k) != v:
                     return False
             return True
-        results = [d for d in self._docs if match(d)]
-        return MockCursor(results)
+        # Lazy: matching stops as soon as the cursor's limit is reached
+        return MockCursor(d for d in self._candidates(filter_dict) if match(d))
+
+_MISSING = object()
+
+class OrderCollection(MockCollection):
+    """Column store for orders: one compact column per Order field instead of a dict per doc.
+
+    Keys outside the fixed layout, and values that don't fit their column, go to a
+    per-row overflow dict, so any document still round-trips through find().
+    """
+    FIELDS = ("user_id", "symbol", "side", "type", "qty", "limit_price", "status", "created_at", "updated_at", "_id")
+    FLOAT_FIELDS = frozenset({"qty", "limit_price"})
+    INTERNED_FIELDS = frozenset({"user_id", "symbol", "type", "status"})
+    SIDES = ("buy", "sell")
+    _NO_SIDE = 255
+
+    def __init__(self):
+        super().__init__()
+        self._rows: Dict[str, int] = {}
+        # float64 arrays for numbers (NaN = absent), one byte per side, object lists otherwise
+        self._cols: Dict[str, Any] = {
+            f: array("d") if f in self.FLOAT_FIELDS else bytearray() if f == "side" else []
+            for f in self.FIELDS
+        }
+        self._extra: List[Optional[Dict[str, Any]]] = []
+
+    def _append(self, doc: Dict[str, Any]) -> None:
+        extra = {k: v for k, v in doc.items() if k not in self._cols}
+        for f, col in self._cols.items():
+            v = doc.get(f, _MISSING)
+            if f == "side":
+                if v in self.SIDES:
+                    col.append(self.SIDES.index(v))
+                    continue
+                col.append(self._NO_SIDE)
+            elif f in self.FLOAT_FIELDS:
+                if type(v) is float and v == v:
+                    col.append(v)
+                    continue
+                col.append(float("nan"))
+            else:
+                # Low-cardinality strings are shared instead of stored once per order
+                col.append(sys.intern(v) if f in self.INTERNED_FIELDS and type(v) is str else v)
+                continue
+            if v is not _MISSING:
+                extra[f] = v
+        self._extra.append(extra or None)
+        self._rows[doc["_id"]] = len(self._extra) - 1
+
+    def _load(self, row: int) -> Dict[str, Any]:
+        doc: Dict[str, Any] = {}
+        for f, col in self._cols.items():
+            v = col[row]
+            if f == "side":
+                if v != self._NO_SIDE:
+                    doc[f] = self.SIDES[v]
+            elif f in self.FLOAT_FIELDS:
+                if v == v:
+                    doc[f] = v
+            elif v is not _MISSING:
+                doc[f] = v
+        extra = self._extra[row]
+        if extra:
+            doc.update(extra)
+        return doc
+
+    def _get(self, _id: Any) -> Optional[Dict[str, Any]]:
+        row = self._rows.get(_id)
+        return None if row is None else self._load(row)
+
+    def _all(self) -> Iterable[Dict[str, Any]]:
+        return (self._load(row) for row in range(len(self._extra)))
 
 class MockCursor:
-    def __init__(self, docs: List[Dict[str, Any]]):
+    def __init__(self, docs: Iterable[Dict[str, Any]]):
         self._docs = docs
+        self._limit: Optional[int] = None
+        self._iter = None
 
     def limit(self, n: int):
-        self._docs = self._docs[:n]
+        # Like pymongo: 0 means no limit, a negative n is treated as abs(n)
+        self._limit = abs(n) or None
         return self
 
     def __iter__(self):
-        return iter(self._docs)
+        return self
 
     def __next__(self):
-        return next(iter(self._docs))
+        if self._iter is None:
+            self._iter = islice(self._docs, self._limit)
+        return next(self._iter)
 
 class MockDB:
+    # Collections with a specialized storage layout; everything else is a plain MockCollection
+    COLLECTION_TYPES = {"order": OrderCollection}
+
     def __init__(self):
         self._collections: Dict[str, MockCollection] = {}
 
     def __getitem__(self, name: str) -> MockCollection:
         if name not in self._collections:
-            self._collections[name] = MockCollection()
+            self._collections[name] = self.COLLECTION_TYPES.get(name, MockCollection)()
         return self._collections[name]
 
     def list_collection_names(self) -> List[str]:
@@ -88,7 +225,18 @@ db = None
 
 if not USE_MOCK_DB and MongoClient and database_url and database_name:
     try:
-        _client = MongoClient(database_url)
+        # Explicit pool/timeouts: keep warm connections around and fail requests
+        # fast on outages instead of waiting out pymongo's 30s server selection
+        _client = MongoClient(
+            database_url,
+            maxPoolSize=200,
+            minPoolSize=16,
+            serverSelectionTimeoutMS=2000,
+            connectTimeoutMS=2000,
+            socketTimeoutMS=5000,
+            retryWrites=True,
+            compressors="zstd,zlib",
+        )
         db = _client[database_name]
         # Lightweight connectivity check (won't throw if server is unreachable until used)
         mongodb_available = True
@@ -102,22 +250,40 @@ else:
 
 # -------------------- Helper functions --------------------
 
-def create_document(collection_name: str, data: Union[BaseModel, dict]):
-    """Insert a single document with timestamps. Returns inserted_id (str)."""
-    # Convert Pydantic model to dict if needed
-    if isinstance(data, BaseModel):
-        data_dict = data.model_dump()
+def _to_document(data: Union[BaseModel, dict], now: datetime) -> Dict[str, Any]:
+    """Convert a model or dict to a storable document stamped with created_at/updated_at."""
+    # Convert Pydantic model to dict if needed; unset optionals (None) aren't stored
+    dump = DUMPERS.get(type(data))
+    if dump is not None:
+        data_dict = dump(data, mode="python", exclude_none=True)
+    elif isinstance(data, BaseModel):
+        data_dict = data.model_dump(exclude_none=True)
     else:
         data_dict = dict(data)
 
-    now = datetime.now(timezone.utc)
     data_dict['created_at'] = now
     data_dict['updated_at'] = now
+    return data_dict
+
 
+def create_document(collection_name: str, data: Union[BaseModel, dict]):
+    """Insert a single document with timestamps. Returns inserted_id (str)."""
+    data_dict = _to_document(data, datetime.now(timezone.utc))
     result = db[collection_name].insert_one(data_dict)
     return str(result.inserted_id)
 
 
+def create_documents(collection_name: str, items: List[Union[BaseModel, dict]]):
+    """Insert many documents in one round trip. Returns inserted_ids (list of str)."""
+    if not items:
+        return []
+    now = datetime.now(timezone.utc)
+    docs = [_to_document(item, now) for item in items]
+    # Unordered: the server may parallelize, and one bad doc doesn't stop the rest
+    result = db[collection_name].insert_many(docs, ordered=False)
+    return [str(x) for x in result.inserted_ids]
+
+
 def get_documents(collection_name: str, filter_dict: dict = None, limit: int = None):
     """Get documents from collection as a list of dicts."""
     cursor = db[collection_name].find(filter_dict or {})
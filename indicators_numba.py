@@ -0,0 +1,85 @@
+"""
+Indicator kernels (SMA/EMA) compiled with Numba
+
+- Kernels operate on contiguous float64 close arrays and return float64 arrays
+- Warm-up positions that have no value yet are NaN (orjson serializes NaN as null)
+- Falls back to plain Python when numba isn't installed so the app still runs
+- EMA is evaluated as a first-order IIR filter via scipy.signal.lfilter when
+  scipy is available, otherwise with the jitted scalar loop
+"""
+
+import numpy as np
+
+try:
+    from numba import njit  # type: ignore
+except Exception:
+    def njit(*args, **kwargs):  # type: ignore
+        """No-op stand-in for numba.njit (supports both @njit and @njit(...))."""
+        if len(args) == 1 and callable(args[0]) and not kwargs:
+            return args[0]
+        return lambda fn: fn
+
+try:
+    from scipy.signal import lfilter  # type: ignore
+except Exception:
+    lfilter = None  # type: ignore
+
+
+@njit(cache=True)
+def _sma_loop(closes: np.ndarray, length: int) -> np.ndarray:
+    n = closes.shape[0]
+    out = np.full(n, np.nan)
+    # Single pass with a running window sum: O(n) instead of O(n * length)
+    running_sum = 0.0
+    for i in range(n):
+        running_sum += closes[i]
+        if i >= length:
+            running_sum -= closes[i - length]
+        if i >= length - 1:
+            out[i] = running_sum / length
+    return out
+
+
+@njit(cache=True)
+def _ema_loop(closes: np.ndarray, length: int) -> np.ndarray:
+    n = closes.shape[0]
+    out = np.empty(n)
+    if n == 0:
+        return out
+    k = 2.0 / (length + 1)
+    prev = closes[0]
+    out[0] = prev
+    for i in range(1, n):
+        prev = closes[i] * k + prev * (1.0 - k)
+        out[i] = prev
+    return out
+
+
+def sma_series(closes: np.ndarray, length: int) -> np.ndarray:
+    return _sma_loop(closes, length)
+
+
+def _ema_lfilter(closes: np.ndarray, length: int) -> np.ndarray:
+    # y[i] = k*x[i] + (1-k)*y[i-1], seeded so that y[0] == x[0]
+    k = 2.0 / (length + 1)
+    out, _ = lfilter([k], [1.0, -(1.0 - k)], closes, zi=[closes[0] * (1.0 - k)])
+    return out
+
+
+def ema_series(closes: np.ndarray, length: int) -> np.ndarray:
+    if lfilter is not None and closes.shape[0]:
+        values = _ema_lfilter(closes, length)
+    else:
+        values = _ema_loop(closes, length)
+    # Round the whole series in one vectorized pass
+    return np.round(values, 6)
+
+
+def warm_up() -> None:
+    """Compile (or load cached) both jitted kernels.
+
+    Calls the loops directly: with scipy installed ema_series goes through lfilter
+    and would never compile _ema_loop, which is still used for empty series.
+    """
+    _sma_loop(np.zeros(2), 1)
+    _ema_loop(np.zeros(2), 1)
@@ -1,20 +1,88 @@
+import asyncio
 import os
+import threading
 import time
+from contextlib import asynccontextmanager
 from datetime import datetime, timedelta, timezone
-from typing import List, Optional
-
-import requests
-from fastapi import FastAPI, HTTPException, Query
+from functools import wraps
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+from cachetools import TTLCache
+from fastapi import FastAPI, HTTPException, Query, Response
+from fastapi.concurrency import run_in_threadpool
 from fastapi.middleware.cors import CORSMiddleware
-from pydantic import BaseModel
+from fastapi.responses import ORJSONResponse
 
 from database import db, create_document, get_documents
+from indicators_numba import sma_series, ema_series, warm_up
 from schemas import WatchlistItem, Order, Position, Layout
 
 FINNHUB_BASE = "https://finnhub.io/api/v1"
 API_KEY = os.getenv("MARKET_DATA_API_KEY") or os.getenv("FINNHUB_API_KEY")
 
-app = FastAPI()
+# Upstream response cache TTLs (seconds) per Finnhub path. Candle calls pass
+# their own TTL (one bar for closed bars, a few seconds for the forming bar);
+# paths without a TTL are never cached.
+QUOTE_CACHE_TTL = 3
+FORMING_BAR_CACHE_TTL = 5
+_CACHE_TTLS = {
+    "/stock/symbol": 86400,
+    "/forex/symbol": 86400,
+    "/quote": QUOTE_CACHE_TTL,
+}
+_CACHE_MAXSIZE = 4096
+
+# Rendered-response cache TTLs (seconds) for public, slow-moving routes
+# Symbol searches are keyed on free text, so keep few and short-lived; the
+# upstream symbol lists themselves are cached for a day
+SYMBOLS_RESPONSE_TTL = 300
+SYMBOLS_RESPONSE_MAXSIZE = 256
+CANDLES_RESPONSE_TTL = FORMING_BAR_CACHE_TTL  # body includes the forming bar
+QUOTE_RESPONSE_TTL = 2
+
+# Timeframe -> Finnhub resolution, and seconds per bar for each resolution
+_TF_TO_RES = {
+    "1m": "1",
+    "5m": "5",
+    "15m": "15",
+    "30m": "30",
+    "1h": "60",
+    "4h": "240",
+    "1d": "D",
+    "1w": "W",
+    "1mo": "M",
+}
+_SEC_PER = {"1": 60, "5": 300, "15": 900, "30": 1800, "60": 3600, "240": 14400}
+_DAILY_TFS = frozenset({"D", "W", "M"})
+# Longest span a bar can cover; W/M bars start at a week/month boundary, so the
+# live bar can begin up to a full period before today
+_BAR_PERIOD = {"W": 7 * 86400, "M": 31 * 86400}
+
+# Shared async client: pooled keep-alive HTTP/2 connections, and upstream waits
+# don't hold a threadpool slot
+_client = httpx.AsyncClient(
+    base_url=FINNHUB_BASE,
+    timeout=15.0,
+    transport=httpx.AsyncHTTPTransport(
+        http2=True,
+        retries=2,
+        limits=httpx.Limits(max_connections=100, max_keepalive_connections=32),
+    ),
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Compile (or load from cache) the Numba kernels now, not on the event loop
+    # during the first indicator request
+    warm_up()
+    yield
+    await _client.aclose()
+
+
+app = FastAPI(lifespan=lifespan, default_response_class=ORJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -25,15 +93,6 @@ app.add_middleware(
 )
 
 
-class Candle(BaseModel):
-    t: int  # epoch seconds
-    o: float
-    h: float
-    l: float
-    c: float
-    v: float
-
-
 # --------- Utility functions ---------
 
 def _ensure_api_key():
@@ -41,28 +100,81 @@ def _ensure_api_key():
         raise HTTPException(status_code=400, detail="Market data API key not configured. Set FINNHUB_API_KEY or MARKET_DATA_API_KEY.")
 
 
-def _finnhub_get(path: str, params: dict):
+_caches: Dict[int, TTLCache] = {}
+_cache_lock = threading.Lock()
+
+
+def _ttl_cached(fn):
+    """Cache upstream JSON per (path, params) for the path's TTL (or an explicit ttl=)."""
+    @wraps(fn)
+    async def wrapper(path: str, params: dict, ttl: Optional[int] = None):
+        ttl = ttl if ttl is not None else _CACHE_TTLS.get(path)
+        if not ttl:
+            return await fn(path, params)
+        key = (path, tuple(sorted(params.items())))
+        with _cache_lock:
+            cache = _caches.get(ttl)
+            if cache is None:
+                cache = _caches[ttl] = TTLCache(maxsize=_CACHE_MAXSIZE, ttl=ttl)
+            hit = cache.get(key)
+        if hit is not None:
+            return hit
+        data = await fn(path, params)
+        with _cache_lock:
+            cache[key] = data
+        return data
+    return wrapper
+
+
+def _cached_response(ttl: int, key=None, maxsize: int = _CACHE_MAXSIZE):
+    """Cache an endpoint's rendered JSON body per query args for ttl seconds.
+
+    key(kwargs), if given, replaces the raw query args as the cache key, e.g. to
+    normalize them or to add the current bar so entries roll over with it.
+
+    Only for public routes: the key is the query args alone, so never use it on
+    per-user data (watchlist, orders, layouts). A handler can opt a response out
+    (e.g. partial results) by returning it with "Cache-Control: no-store".
+    """
+    cache = TTLCache(maxsize=maxsize, ttl=ttl)
+    key_fn = key
+
+    def decorator(fn):
+        @wraps(fn)
+        async def wrapper(**kwargs):
+            key = key_fn(kwargs) if key_fn is not None else tuple(sorted(kwargs.items()))
+            with _cache_lock:
+                body = cache.get(key)
+            if body is None:
+                result = await fn(**kwargs)
+                response = result if isinstance(result, Response) else ORJSONResponse(result)
+                if response.headers.get("cache-control") == "no-store":
+                    return response
+                body = response.body
+                with _cache_lock:
+                    cache[key] = body
+            return Response(content=body, media_type="application/json")
+        return wrapper
+    return decorator
+
+
+@_ttl_cached
+async def _finnhub_get(path: str, params: dict):
     _ensure_api_key()
     params = {**params, "token": API_KEY}
-    r = requests.get(f"{FINNHUB_BASE}{path}", params=params, timeout=15)
+    r = await _client.get(path, params=params)
     if r.status_code != 200:
         raise HTTPException(status_code=r.status_code, detail=r.text)
     return r.json()
 
 
 def timeframe_to_resolution(tf: str) -> str:
-    mapping = {
-        "1m": "1",
-        "5m": "5",
-        "15m": "15",
-        "30m": "30",
-        "1h": "60",
-        "4h": "240",
-        "1d": "D",
-        "1w": "W",
-        "1mo": "M",
-    }
-    return mapping.get(tf, "1")
+    return _TF_TO_RES.get(tf, "1")
+
+
+def resolution_seconds(tf: str) -> int:
+    """Bar length in seconds for a Finnhub resolution."""
+    return 86400 if tf in _DAILY_TFS else _SEC_PER.get(tf, 60)
 
 
 def is_forex_symbol(symbol: str) -> bool:
@@ -72,7 +184,7 @@ def is_forex_symbol(symbol: str) -> bool:
 
 # --------- Health ---------
 @app.get("/")
-def root():
+async def root():
     return {"service": "trading-platform-backend", "time": datetime.now(timezone.utc).isoformat()}
 
 
@@ -86,129 +198,215 @@ def test_database():
 
 
 # --------- Market Data ---------
+def _symbol_sources(market: str, stock_exchanges: Optional[str], forex_exchanges: Optional[str]) -> List[tuple]:
+    """Upstream symbol lists to search, as (path, market, exchange)."""
+    sources = []
+    if market in ("stock", "all"):
+        exchanges = [e.strip() for e in (stock_exchanges or "US").split(",") if e.strip()]
+        sources += [("/stock/symbol", "stock", ex) for ex in exchanges]
+    if market in ("forex", "all"):
+        fx_exs = [e.strip() for e in (forex_exchanges or "OANDA,FXCM").split(",") if e.strip()]
+        sources += [("/forex/symbol", "forex", ex) for ex in fx_exs]
+    return sources
+
+
+def _symbols_key(kwargs: dict) -> tuple:
+    # Normalized so equivalent queries (case, spacing, out-of-range limits) share an entry
+    q = kwargs["q"]
+    return (
+        tuple(_symbol_sources(kwargs["market"], kwargs["stock_exchanges"], kwargs["forex_exchanges"])),
+        q.lower() if q else None,
+        max(1, min(kwargs["limit"], 500)),
+    )
+
+
 @app.get("/api/symbols")
-def list_symbols(
+@_cached_response(SYMBOLS_RESPONSE_TTL, key=_symbols_key, maxsize=SYMBOLS_RESPONSE_MAXSIZE)
+async def list_symbols(
     q: Optional[str] = Query(None, description="Search query"),
     market: str = Query("stock", description="stock | forex | all"),
     stock_exchanges: Optional[str] = Query(None, description="Comma-separated exchanges for stocks (e.g., US,TO,L,HK)"),
     forex_exchanges: Optional[str] = Query(None, description="Comma-separated forex sources (OANDA,FXCM)"),
     limit: int = 200,
 ):
-    items: List[dict] = []
+    cap = max(1, min(limit, 500))
+    q_lower = q.lower() if q else None
 
-    if market in ("stock", "all"):
-        exchanges = [e.strip() for e in (stock_exchanges or "US").split(",") if e.strip()]
-        for ex in exchanges:
-            try:
-                data = _finnhub_get("/stock/symbol", {"exchange": ex})
-                for it in data:
-                    sym = it.get("symbol")
-                    desc = it.get("description")
-                    if not q or (q.lower() in (sym or "").lower() or q.lower() in (desc or "").lower()):
-                        items.append({"symbol": sym, "description": desc, "market": "stock", "exchange": ex})
-            except HTTPException:
-                continue
+    sources = _symbol_sources(market, stock_exchanges, forex_exchanges)
 
-    if market in ("forex", "all"):
-        fx_exs = [e.strip() for e in (forex_exchanges or "OANDA,FXCM").split(",") if e.strip()]
-        for ex in fx_exs:
-            try:
-                data = _finnhub_get("/forex/symbol", {"exchange": ex})
-                for it in data:
-                    sym = it.get("symbol")  # already like OANDA:EUR_USD
-                    desc = it.get("description") or sym
-                    # Normalize separator to underscore for consistency
-                    norm_sym = sym.replace("/", "_") if sym else sym
-                    if not q or (q.lower() in (norm_sym or "").lower() or q.lower() in (desc or "").lower()):
-                        items.append({"symbol": norm_sym, "description": desc, "market": "forex", "exchange": ex})
-            except HTTPException:
-                continue
-
-    # Deduplicate by symbol
+    # Filter, deduplicate by symbol and stop as soon as the limit is reached
+    items: List[dict] = []
     seen = set()
-    deduped = []
-    for it in items:
-        s = it["symbol"]
-        if s and s not in seen:
-            deduped.append(it)
-            seen.add(s)
-
-    # Limit and return
-    return deduped[: max(1, min(limit, 500))]
-
-
-@app.get("/api/candles")
-def candles(symbol: str, timeframe: str = "1m", count: int = 500):
-    to_ts = int(time.time())
+    errors: List[HTTPException] = []
+
+    def result():
+        # Results missing a failed source are still returned, but never cached
+        if errors:
+            return ORJSONResponse(items, headers={"Cache-Control": "no-store"})
+        return items
+
+    for path, kind, ex in sources:
+        try:
+            data = await _finnhub_get(path, {"exchange": ex})
+        except HTTPException as e:
+            errors.append(e)
+            continue
+        for it in data:
+            sym = it.get("symbol")
+            if kind == "forex":
+                desc = it.get("description") or sym
+                # Already like OANDA:EUR_USD; normalize separator to underscore for consistency
+                sym = sym.replace("/", "_") if sym else sym
+            else:
+                desc = it.get("description")
+            if not sym or sym in seen:
+                continue
+            if q_lower is None or q_lower in sym.lower() or (desc and q_lower in desc.lower()):
+                items.append({"symbol": sym, "description": desc, "market": kind, "exchange": ex})
+                seen.add(sym)
+                if len(items) >= cap:
+                    return result()
+    if errors and len(errors) == len(sources):
+        # Nothing to show: surface the upstream error rather than an empty list
+        raise errors[-1]
+    return result()
+
+
+async def _fetch_raw(symbol: str, timeframe: str, count: int) -> Dict[str, np.ndarray]:
+    """Fetch candles as columns t (epoch seconds, int64) and o/h/l/c/v (float64)."""
     tf = timeframe_to_resolution(timeframe)
-    # Map to seconds range
-    sec_per = {"1":60, "5":300, "15":900, "30":1800, "60":3600, "240":14400}.get(tf, 60)
-    if tf in ["D", "W", "M"]:
-        sec_per = 86400
-    frm = to_ts - sec_per * count
+    sec_per = resolution_seconds(tf)
+    # Closed bars never change: fetch them and cache for a whole bar (the params are
+    # identical for every call within it). A bar starting a full period before the
+    # current bar start has certainly closed; anything newer, including the live
+    # bar, is fetched separately with a short TTL.
+    bar_start = (int(time.time()) // sec_per) * sec_per
+    closed_to = bar_start - _BAR_PERIOD.get(tf, sec_per)
+    frm = bar_start - sec_per * count
 
     if is_forex_symbol(symbol):
         # Normalize separator for finnhub (supports underscore in OANDA/FXCM symbols)
-        sym = symbol.replace("/", "_")
-        data = _finnhub_get("/forex/candle", {"symbol": sym, "resolution": tf, "from": frm, "to": to_ts})
+        path, sym = "/forex/candle", symbol.replace("/", "_")
     else:
-        data = _finnhub_get("/stock/candle", {"symbol": symbol, "resolution": tf, "from": frm, "to": to_ts})
+        path, sym = "/stock/candle", symbol
+    closed, forming = await asyncio.gather(
+        _finnhub_get(path, {"symbol": sym, "resolution": tf, "from": frm, "to": closed_to}, ttl=sec_per),
+        _finnhub_get(path, {"symbol": sym, "resolution": tf, "from": closed_to + 1, "to": bar_start + sec_per - 1}, ttl=FORMING_BAR_CACHE_TTL),
+    )
+
+    parts = [d for d in (closed, forming) if d.get("s") == "ok"]
+    if not parts:
+        raise HTTPException(status_code=400, detail=f"No candle data: {closed}")
+    # Keep Finnhub's columnar layout so indicators get contiguous arrays without unpacking rows
+    cols = {"t": np.concatenate([np.asarray(d["t"], dtype=np.int64) for d in parts])}
+    for k in ("o", "h", "l", "c", "v"):
+        cols[k] = np.concatenate([np.asarray(d[k], dtype=np.float64) for d in parts])
+    return cols
+
 
-    if data.get("s") != "ok":
-        raise HTTPException(status_code=400, detail=f"No candle data: {data}")
-    candles = [
-        Candle(t=t, o=o, h=h, l=l, c=c, v=v).model_dump()
-        for t, o, h, l, c, v in zip(data["t"], data["o"], data["h"], data["l"], data["c"], data["v"])
+def _candles_key(kwargs: dict) -> tuple:
+    # Include the current bar so entries roll over at bar boundaries
+    bar = int(time.time()) // resolution_seconds(timeframe_to_resolution(kwargs["timeframe"]))
+    return tuple(sorted(kwargs.items())) + (bar,)
+
+
+@app.get("/api/candles")
+@_cached_response(CANDLES_RESPONSE_TTL, key=_candles_key)
+async def candles(symbol: str, timeframe: str = "1m", count: int = 500):
+    cols = await _fetch_raw(symbol, timeframe, count)
+    # Plain dicts: the arrays come straight from Finnhub, so per-row model validation buys nothing
+    rows = [
+        {"t": t, "o": o, "h": h, "l": l, "c": c, "v": v}
+        for t, o, h, l, c, v in zip(*(cols[k].tolist() for k in ("t", "o", "h", "l", "c", "v")))
     ]
-    return candles
+    # Returning the response directly skips jsonable_encoder; orjson dumps the rows in C
+    return ORJSONResponse(rows)
 
 
-@app.get("/api/quote")
-def quote(symbol: str):
+async def _fetch_quote(symbol: str) -> dict:
     if is_forex_symbol(symbol):
         # Finnhub has no dedicated /forex/quote; use latest candle as quote
         tf = timeframe_to_resolution("1m")
-        to_ts = int(time.time())
+        to_ts = (int(time.time()) // 60) * 60  # current 1m bar start, stable within the bar
         frm = to_ts - 3600  # last hour
         sym = symbol.replace("/", "_")
-        data = _finnhub_get("/forex/candle", {"symbol": sym, "resolution": tf, "from": frm, "to": to_ts})
+        data = await _finnhub_get("/forex/candle", {"symbol": sym, "resolution": tf, "from": frm, "to": to_ts}, ttl=QUOTE_CACHE_TTL)
         if data.get("s") != "ok" or not data.get("c"):
             raise HTTPException(status_code=400, detail=f"No forex quote data: {data}")
         return {"c": data["c"][-1], "h": data["h"][-1], "l": data["l"][-1], "o": data["o"][-1], "t": data["t"][-1]}
     else:
-        data = _finnhub_get("/quote", {"symbol": symbol})
+        data = await _finnhub_get("/quote", {"symbol": symbol})
         return data
 
 
+@app.get("/api/quote")
+@_cached_response(QUOTE_RESPONSE_TTL)
+async def quote(symbol: str):
+    return await _fetch_quote(symbol)
+
+
 # --------- Indicators (simple server-side SMA/EMA) ---------
+_INDICATORS = {"sma": sma_series, "ema": ema_series}
+# Batch budget, in upstream calls: each symbol costs one closed-bar and one
+# forming-bar candle call (_fetch_raw). Finnhub allows ~30 calls/s, so a batch
+# may issue at most 50 calls, at most 10 of them in flight at once.
+_UPSTREAM_CALLS_PER_SYMBOL = 2
+_BATCH_MAX_UPSTREAM_CALLS = 50
+_BATCH_MAX_IN_FLIGHT = 10
+_BATCH_MAX_SYMBOLS = _BATCH_MAX_UPSTREAM_CALLS // _UPSTREAM_CALLS_PER_SYMBOL
+
+
+async def _fetch_closes(symbol: str, timeframe: str, count: int = 600) -> np.ndarray:
+    return (await _fetch_raw(symbol, timeframe, count))["c"]
+
+
 @app.get("/api/indicators/sma")
-def sma(symbol: str, timeframe: str = "1m", length: int = 20):
-    candles_data = candles(symbol, timeframe, 600)
-    closes = [c["c"] for c in candles_data]
-    out = []
-    for i in range(len(closes)):
-        if i + 1 < length:
-            out.append(None)
-        else:
-            window = closes[i + 1 - length : i + 1]
-            out.append(sum(window) / length)
-    return {"values": out, "length": length}
+async def sma(symbol: str, timeframe: str = "1m", length: int = Query(20, ge=1)):
+    closes = await _fetch_closes(symbol, timeframe)
+    return ORJSONResponse({"values": sma_series(closes, length), "length": length})
 
 
 @app.get("/api/indicators/ema")
-def ema(symbol: str, timeframe: str = "1m", length: int = 20):
-    candles_data = candles(symbol, timeframe, 600)
-    closes = [c["c"] for c in candles_data]
-    out: List[Optional[float]] = []
-    k = 2 / (length + 1)
-    ema_prev = None
-    for i, price in enumerate(closes):
-        if i == 0:
-            ema_prev = price
+async def ema(symbol: str, timeframe: str = "1m", length: int = Query(20, ge=1)):
+    closes = await _fetch_closes(symbol, timeframe)
+    return ORJSONResponse({"values": ema_series(closes, length), "length": length})
+
+
+@app.get("/api/indicators/batch")
+async def indicators_batch(
+    symbols: str = Query(..., description="Comma-separated symbols (e.g., AAPL,MSFT,OANDA:EUR_USD)"),
+    indicator: str = Query("sma", description="sma | ema"),
+    timeframe: str = "1m",
+    length: int = Query(20, ge=1),
+):
+    series = _INDICATORS.get(indicator)
+    if series is None:
+        raise HTTPException(status_code=400, detail=f"Unknown indicator: {indicator}")
+    syms = list(dict.fromkeys(s.strip() for s in symbols.split(",") if s.strip()))
+    if len(syms) > _BATCH_MAX_SYMBOLS:
+        raise HTTPException(status_code=400, detail=f"Too many symbols: {len(syms)} (max {_BATCH_MAX_SYMBOLS})")
+
+    # Fetch symbols concurrently, bounded so the fan-out stays under the upstream
+    # rate limit; one bad symbol (upstream error or network failure) shouldn't
+    # fail the batch
+    gate = asyncio.Semaphore(max(1, _BATCH_MAX_IN_FLIGHT // _UPSTREAM_CALLS_PER_SYMBOL))
+
+    async def fetch(sym: str) -> np.ndarray:
+        async with gate:
+            return await _fetch_closes(sym, timeframe)
+
+    results = await asyncio.gather(*(fetch(s) for s in syms), return_exceptions=True)
+    out = {}
+    for sym, res in zip(syms, results):
+        if isinstance(res, HTTPException):
+            out[sym] = {"error": res.detail}
+        elif isinstance(res, httpx.HTTPError):
+            out[sym] = {"error": str(res) or type(res).__name__}
+        elif isinstance(res, BaseException):
+            raise res
         else:
-            ema_prev = price * k + ema_prev * (1 - k)
-        out.append(round(ema_prev, 6))
-    return {"values": out, "length": length}
+            out[sym] = {"values": series(res, length), "length": length}
+    return ORJSONResponse(out)
 
 
 # --------- Watchlist ---------
@@ -226,21 +424,20 @@ def add_watchlist(item: WatchlistItem):
 
 # --------- Paper Trading (simplified) ---------
 @app.post("/api/orders")
-def place_order(order: Order):
+async def place_order(order: Order):
     # For market orders, we fill immediately at last price
     if order.type == "market":
         if is_forex_symbol(order.symbol):
-            q = quote(order.symbol)
+            q = await _fetch_quote(order.symbol)
             last = q.get("c")
         else:
-            q = _finnhub_get("/quote", {"symbol": order.symbol})
+            q = await _finnhub_get("/quote", {"symbol": order.symbol})
             last = q.get("c")
         if not last:
             raise HTTPException(status_code=400, detail="No last price")
         order.limit_price = last
         order.status = "filled"
-        order.created_at = datetime.now(timezone.utc)
-    _id = create_document("order", order)
+    _id = await run_in_threadpool(create_document, "order", order)
     return {"order_id": _id, "status": order.status, "fill_price": order.limit_price}
 
 
@@ -8,7 +8,7 @@ Each Pydantic model corresponds to a MongoDB collection (lowercased class name).
 - Layout -> "layout"
 """
 from typing import Optional, Literal, List
-from pydantic import BaseModel, Field
+from pydantic import BaseModel, Field, TypeAdapter
 from datetime import datetime
 
 class WatchlistItem(BaseModel):
@@ -38,3 +38,6 @@ class Layout(BaseModel):
     user_id: str = Field("demo")
     name: str
     data: dict
+
+# Prebuilt serializers keyed by model class, so inserts do a single dict lookup
+DUMPERS = {model: TypeAdapter(model).dump_python for model in (WatchlistItem, Order, Position, Layout)}
@@ -0,0 +1,44 @@
+import sys
+import threading
+
+from database import OrderCollection
+
+
+def test_order_collection_concurrent_inserts_keep_rows_consistent():
+    coll = OrderCollection()
+    n_threads, per_thread = 8, 2000
+
+    def worker(t: int):
+        for i in range(per_thread):
+            coll.insert_one({
+                "_id": f"{t}-{i}",
+                "user_id": f"u{t}",
+                "symbol": f"S{t}-{i}",
+                "side": "buy" if i % 2 else "sell",
+                "qty": float(i),
+            })
+
+    interval = sys.getswitchinterval()
+    sys.setswitchinterval(1e-6)  # force frequent thread switches mid-insert
+    try:
+        threads = [threading.Thread(target=worker, args=(t,)) for t in range(n_threads)]
+        for th in threads:
+            th.start()
+        for th in threads:
+            th.join()
+    finally:
+        sys.setswitchinterval(interval)
+
+    docs = list(coll.find())
+    assert len(docs) == n_threads * per_thread
+    for doc in docs + [next(coll.find({"_id": d["_id"]})) for d in docs]:
+        t, i = map(int, doc["_id"].split("-"))
+        assert doc == {
+            "_id": f"{t}-{i}",
+            "user_id": f"u{t}",
+            "symbol": f"S{t}-{i}",
+            "side": "buy" if i % 2 else "sell",
+            "qty": float(i),
+        }
+    for t in range(n_threads):
+        assert len(list(coll.find({"user_id": f"u{t}"}))) == per_thread